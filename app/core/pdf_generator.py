@@ -2,10 +2,12 @@
 import io
 import logging
 import os
-import tempfile
-import shutil
-from typing import List
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
+import numpy as np
 from PIL import Image, UnidentifiedImageError
 from PyQt5.QtCore import QThread, pyqtSignal
 from reportlab.lib.utils import ImageReader
@@ -15,28 +17,66 @@ from .settings import GridSettings, MM_TO_PT
 
 logger = logging.getLogger(__name__)
 
+# 処理済み画像キャッシュの最大エントリ数
+READER_CACHE_MAX_ENTRIES: int = 64
+
+def compute_placements(img_widths: np.ndarray, img_heights: np.ndarray,
+                       cols: int, rows: int,
+                       col_width_pt: float, row_height_pt: float,
+                       margin_left_pt: float, margin_bottom_pt: float
+                       ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """全セル分の配置 (x, y, 描画幅, 描画高さ) をベクトル演算で一括計算する。
+
+    引数の画像サイズ配列はセルの行優先順（r * cols + c）に対応する。
+    """
+    img_aspect = img_widths / img_heights
+    cell_aspect = col_width_pt / row_height_pt
+
+    # アスペクト比を保持してセルに内接させる
+    wide = img_aspect > cell_aspect
+    draw_ws = np.where(wide, col_width_pt, row_height_pt * img_aspect)
+    draw_hs = np.where(wide, col_width_pt / img_aspect, row_height_pt)
+
+    cell_cols = np.tile(np.arange(cols), rows)
+    cell_rows = np.repeat(np.arange(rows), cols)
+
+    # セル内センタリング（PDF座標系は原点が左下）
+    xs = margin_left_pt + cell_cols * col_width_pt + (col_width_pt - draw_ws) / 2
+    ys = margin_bottom_pt + cell_rows * row_height_pt + (row_height_pt - draw_hs) / 2
+    return xs, ys, draw_ws, draw_hs
+
 class PDFGenerationThread(QThread):
     """PDF生成をバックグラウンドで実行するスレッド"""
-    finished = pyqtSignal(str, str)  # 成功時に一時ファイルパスとディレクトリを送信
+    finished = pyqtSignal(str)  # 成功時に保存先パスを送信
     error = pyqtSignal(str)     # エラー時にメッセージを送信
     progress = pyqtSignal(int)  # 進捗状況を送信
 
-    def __init__(self, image_paths: List[str], settings: GridSettings):
+    def __init__(self, image_paths: List[str], settings: GridSettings, save_path: str):
         super().__init__()
         self.image_paths = image_paths
         self.settings = settings
-        self.temp_dir = None
+        self.save_path = save_path
+        # 処理済み画像のLRUキャッシュ: (パス, 更新時刻, 描画幅, 描画高さ) -> ImageReader
+        self._reader_cache: 'OrderedDict[Tuple[str, float, float, float], ImageReader]' = OrderedDict()
+        self._cache_lock = threading.Lock()  # ワーカースレッドからのキャッシュアクセス保護
+        self._size_cache: Dict[str, Tuple[int, int]] = {}  # パス -> 画像ピクセルサイズ
 
     def run(self) -> None:
+        # 保存先に直接書き込む（.partに書いてから差し替えることで中途半端なPDFを残さない）
+        part_path = self.save_path + '.part'
         try:
-            self.temp_dir = tempfile.mkdtemp()  # 一時ディレクトリを作成
-            file_path = os.path.join(self.temp_dir, "output.pdf")
-            pdf = canvas.Canvas(file_path, pagesize=self.settings.page_size)
-            
+            pdf = canvas.Canvas(part_path, pagesize=self.settings.page_size)
+
+            # マージンはジョブ中不変なので、pt換算を先に1回だけ行う
+            m_left_pt = self.settings.margin_left_mm * MM_TO_PT
+            m_right_pt = self.settings.margin_right_mm * MM_TO_PT
+            m_top_pt = self.settings.margin_top_mm * MM_TO_PT
+            m_bottom_pt = self.settings.margin_bottom_mm * MM_TO_PT
+
             # 印刷可能域を計算
             page_width, page_height = self.settings.page_size
-            printable_width = page_width - (self.settings.margin_left_mm + self.settings.margin_right_mm) * MM_TO_PT
-            printable_height = page_height - (self.settings.margin_top_mm + self.settings.margin_bottom_mm) * MM_TO_PT
+            printable_width = page_width - (m_left_pt + m_right_pt)
+            printable_height = page_height - (m_top_pt + m_bottom_pt)
             
             total_images = len(self.image_paths)
             
@@ -56,98 +96,154 @@ class PDFGenerationThread(QThread):
             # 画像が1枚も指定されていない場合は、少なくとも1ページは生成する
             total_pages = max(1, (total_images + cells_per_page - 1) // cells_per_page) if total_images > 0 else 1
 
-            img_idx = 0
-            for page_num in range(total_pages):
-                logger.info(f"{page_num + 1}ページ目の生成を開始します。")
-
-                if self.settings.grid_line_visible:
-                    self._draw_grid_lines(pdf, cols, rows, actual_col_width_pt, actual_row_height_pt,
-                                        printable_width, printable_height,
-                                        self.settings.margin_left_mm * MM_TO_PT,
-                                        self.settings.margin_bottom_mm * MM_TO_PT)
-                
-                for r in range(rows):
-                    if self.isInterruptionRequested(): return
-                    for c in range(cols):
-                        # 現在のページ内のセルインデックス
-                        current_cell_in_page = r * cols + c
-                        
-                        # 画像リストのインデックスを循環させる
-                        image_to_use_idx = current_cell_in_page % len(self.image_paths) if self.image_paths else 0
-
-                        progress_val = int(((page_num * cells_per_page) + current_cell_in_page + 1) / (total_pages * cells_per_page) * 100)
-                        self.progress.emit(progress_val)
-                        
-                        if self.image_paths: # 画像が指定されている場合のみ処理
-                            try:
-                                self._process_image(pdf, self.image_paths[image_to_use_idx], 
-                                                  r, c, actual_col_width_pt, actual_row_height_pt,
-                                                  page_height, self.temp_dir,
-                                                  self.settings.margin_left_mm * MM_TO_PT,
-                                                  self.settings.margin_bottom_mm * MM_TO_PT)
-                            except UnidentifiedImageError as e:
-                                logger.error(f"画像の読み込みに失敗しました: {self.image_paths[image_to_use_idx]}, エラー: {e}")
-                                pass # エラーがあっても処理を続行
-                            except Exception as e:
-                                logger.error(f"画像の処理中にエラーが発生しました: {self.image_paths[image_to_use_idx]}, エラー: {e}")
-                                pass # エラーがあっても処理を続行
-                
-                if page_num < total_pages - 1: # 最後のページでなければ新しいページを追加
-                    pdf.showPage()
-            
-            # グリッド線の描画（マージンを考慮）
+            # 画像リストはセル位置で循環するため、どのページも同じ配置になる。
+            # ヘッダのみの読み込みで画像サイズを集め、全セル分の配置を1回だけ一括計算する
+            cell_paths: List[str] = []
+            xs = ys = draw_ws = draw_hs = None
+            if self.image_paths:
+                cell_paths = [self.image_paths[i % total_images] for i in range(cells_per_page)]
+                sizes = np.array([self._get_image_size(p) for p in cell_paths], dtype=np.float64)
+                xs, ys, draw_ws, draw_hs = compute_placements(
+                    sizes[:, 0], sizes[:, 1], cols, rows,
+                    actual_col_width_pt, actual_row_height_pt,
+                    m_left_pt, m_bottom_pt)
+
+            # グリッド線は全ページ共通なので座標を1回だけ計算する
+            grid_lines = None
             if self.settings.grid_line_visible:
-                self._draw_grid_lines(pdf, cols, rows, actual_col_width_pt, actual_row_height_pt,
-                                    printable_width, printable_height,
-                                    self.settings.margin_left_mm * MM_TO_PT,
-                                    self.settings.margin_bottom_mm * MM_TO_PT)
-            
+                grid_lines = self._compute_grid_lines(cols, rows, actual_col_width_pt, actual_row_height_pt,
+                                                      printable_width, printable_height,
+                                                      m_left_pt, m_bottom_pt)
+
+            # 画像の準備（デコード・リサイズ・エンコード）はPillowがGILを解放するため
+            # スレッドプールで並列化し、canvasへの描画は本スレッドのみで行う
+            executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+            try:
+                for page_num in range(total_pages):
+                    logger.info(f"{page_num + 1}ページ目の生成を開始します。")
+
+                    if grid_lines is not None:
+                        self._draw_grid_lines(pdf, grid_lines)
+
+                    # ページ内の全セル分の準備タスクを先に投入する
+                    futures = [executor.submit(self._build_reader, cell_paths[i],
+                                               draw_ws[i], draw_hs[i])
+                               for i in range(len(cell_paths))]
+
+                    # 完了した結果を決定的な順序で描画する
+                    for i in range(cells_per_page):
+                        if self.isInterruptionRequested():
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            self._remove_part_file(part_path)
+                            return
+
+                        progress_val = int(((page_num * cells_per_page) + i + 1) / (total_pages * cells_per_page) * 100)
+                        self.progress.emit(progress_val)
+
+                        if i >= len(futures): # 画像が指定されている場合のみ処理
+                            continue
+                        try:
+                            reader = futures[i].result()
+                            self._draw_reader(pdf, reader, xs[i], ys[i], draw_ws[i], draw_hs[i])
+                        except UnidentifiedImageError as e:
+                            logger.error(f"画像の読み込みに失敗しました: {cell_paths[i]}, エラー: {e}")
+                            pass # エラーがあっても処理を続行
+                        except Exception as e:
+                            logger.error(f"画像の処理中にエラーが発生しました: {cell_paths[i]}, エラー: {e}")
+                            pass # エラーがあっても処理を続行
+
+                    if page_num < total_pages - 1: # 最後のページでなければ新しいページを追加
+                        pdf.showPage()
+            finally:
+                executor.shutdown(wait=True)
+
             pdf.save()
-            self.finished.emit(file_path, self.temp_dir)
-            
+            os.replace(part_path, self.save_path)  # 書き込み完了後にアトミックに差し替え
+            self.finished.emit(self.save_path)
+
         except Exception as e:
             logger.error(f"PDF生成中にエラーが発生しました: {e}")
+            self._remove_part_file(part_path)
             self.error.emit(str(e))
 
-    def __del__(self):
-        """デストラクタ：一時ディレクトリの削除"""
+    def _remove_part_file(self, part_path: str) -> None:
+        """書きかけのPDFを削除する"""
         try:
-            if hasattr(self, 'temp_dir') and self.temp_dir and os.path.exists(self.temp_dir):
-                import shutil
-                shutil.rmtree(self.temp_dir)
-        except Exception as e:
-            logger.error(f"一時ディレクトリの削除中にエラーが発生しました: {e}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        except OSError as e:
+            logger.error(f"一時ファイルの削除中にエラーが発生しました: {e}")
 
-    def _process_image(self, pdf: canvas.Canvas, img_path: str, row: int, col: int,
-                      col_width_pt: float, row_height_pt: float, page_height: float,
-                      temp_dir: str, margin_left_pt: float, margin_bottom_pt: float) -> None:
-        """画像を処理してPDFに配置"""
-        with Image.open(img_path) as img:
-            # メタデータを含めて完全なコピーを作成
-            img = img.copy()
+    def _draw_reader(self, pdf: canvas.Canvas, reader: ImageReader,
+                     x_offset: float, y_offset: float,
+                     new_width: float, new_height: float) -> None:
+        """準備済みの画像をPDFに配置"""
+        pdf.drawImage(
+            reader,
+            x_offset,
+            y_offset,
+            new_width,
+            new_height,
+            preserveAspectRatio=True,
+            mask='auto'
+        )
+
+    def _get_image_size(self, img_path: str) -> Tuple[int, int]:
+        """画像のピクセルサイズをヘッダのみの読み込みで取得する。
+
+        読み込めない画像はダミーサイズを返し、エラーは後段のデコード時に報告される。
+        """
+        cached = self._size_cache.get(img_path)
+        if cached is not None:
+            return cached
+        try:
+            with Image.open(img_path) as img:
+                size = img.size
+        except Exception:
+            size = (1, 1)
+        self._size_cache[img_path] = size
+        return size
 
+    def _build_reader(self, img_path: str, new_width: float,
+                      new_height: float) -> ImageReader:
+        """画像をリサイズ・変換・エンコードし、描画用のImageReaderを返す。
+
+        画像リストはページをまたいで循環するため、同一画像を同一描画サイズで
+        再処理しないよう結果をLRUキャッシュする。キーには更新時刻を含め、
+        生成中にファイルが差し替わった場合に古い結果を使い回さない。
+        """
+        try:
+            mtime = os.path.getmtime(img_path)
+        except OSError:
+            mtime = -1.0
+        cache_key = (img_path, mtime, round(new_width, 1), round(new_height, 1))
+        with self._cache_lock:
+            cached = self._reader_cache.get(cache_key)
+            if cached is not None:
+                self._reader_cache.move_to_end(cache_key)  # LRU更新
+                return cached
+
+        with Image.open(img_path) as img:
             # 画像の色空間を確認
             original_mode = img.mode
 
-            # 高品質なリサイズ
-            img_width, img_height = img.size
-            img_aspect = img_width / img_height
-            cell_aspect = col_width_pt / row_height_pt
-            
-            if img_aspect > cell_aspect:
-                new_width = col_width_pt
-                new_height = col_width_pt / img_aspect
-            else:
-                new_height = row_height_pt
-                new_width = row_height_pt * img_aspect
-            
-            # Lanczosフィルターによる高品質なリサイズ
-            # 解像度を維持するために、より大きなサイズでリサイズ
-            scale_factor = 3.0  # 解像度を2倍に
-            img = img.resize(
-                (int(new_width * scale_factor), int(new_height * scale_factor)), 
-                Image.Resampling.LANCZOS
-            )
+            # 出力DPIに必要なピクセル数まで直接縮小する（1pt = 1/72インチ）
+            # これ以上のピクセルはPDF側で破棄されるだけなので供給しない
+            target_w_px = max(1, int(new_width / 72.0 * self.settings.output_dpi))
+            target_h_px = max(1, int(new_height / 72.0 * self.settings.output_dpi))
+
+            # JPEGはlibjpegのDCTスケーリングで縮小済みの状態でデコードできる
+            # （非対応フォーマットではdraftは何もしない）
+            if img.format == 'JPEG':
+                img.draft('RGB', (target_w_px, target_h_px))
+
+            # 入力が目標より大幅に大きい場合は、整数倍の箱型縮小で
+            # Lanczosに渡すピクセル数を先に削っておく（品質への影響は無視できる）
+            factor = min(img.width // target_w_px, img.height // target_h_px) // 2
+            if factor > 1:
+                img = img.reduce(factor)
+
+            img.thumbnail((target_w_px, target_h_px), Image.Resampling.LANCZOS)
 
             # 色空間変換の詳細処理
             if original_mode == 'RGBA':
@@ -156,60 +252,56 @@ class PDFGenerationThread(QThread):
                 background.paste(img, mask=img.split()[3])
                 img = background
 
-            # RGBからCMYKへの変換を試みる
-            try:
-                if img.mode != 'CMYK':
-                    # PIL標準のCMYK変換
-                    img_cmyk = img.convert('CMYK')
-                else:
-                    img_cmyk = img
-            except Exception as e:
-                print(f"CMYK変換エラー: {e}")
-                # エラーが発生した場合はRGBのまま処理を続行
-                img_cmyk = img.convert('RGB')
-
-            # 高品質な一時ファイル保存（TIFFを推奨）
-            temp_img_path = os.path.join(temp_dir, f"temp_{row}_{col}.tiff")
-            img_cmyk.save(
-                temp_img_path, 
-                format='TIFF', 
-                compression='tiff_deflate',
-                dpi=(600, 600)  # 高解像度設定
-            )
-            
-            # セル内でのセンタリング計算（マージンを考慮）
-            x_offset = margin_left_pt + col * col_width_pt + (col_width_pt - new_width) / 2
-            # PDFの座標系に合わせてY座標を計算（原点が左下）
-            y_offset = margin_bottom_pt + row * row_height_pt + (row_height_pt - new_height) / 2
-            
-            # PDFに画像を配置
-            pdf.drawImage(
-                temp_img_path, 
-                x_offset, 
-                y_offset, 
-                new_width, 
-                new_height,
-                preserveAspectRatio=True,
-                mask='auto'
-            )
-
-    def _draw_grid_lines(self, pdf: canvas.Canvas, cols: int, rows: int,
-                        col_width_pt: float, row_height_pt: float,
-                        printable_width: float, printable_height: float,
-                        margin_left_pt: float, margin_bottom_pt: float) -> None:
-        """グリッド線を描画する"""
+            # 出力カラースペースへの変換（印刷用途の場合のみCMYK）
+            if self.settings.output_color == 'CMYK':
+                # RGBからCMYKへの変換を試みる
+                try:
+                    if img.mode != 'CMYK':
+                        # PIL標準のCMYK変換
+                        img_out = img.convert('CMYK')
+                    else:
+                        img_out = img
+                except Exception as e:
+                    logger.error(f"CMYK変換エラー: {e}")
+                    # エラーが発生した場合はRGBのまま処理を続行
+                    img_out = img.convert('RGB')
+            else:
+                # PDFビューアはRGBをそのまま描画できるため、ピクセル単位の変換を省く
+                img_out = img if img.mode == 'RGB' else img.convert('RGB')
+
+            # ディスクを経由せず、メモリ上のJPEGをreportlabに直接渡す
+            buffer = io.BytesIO()
+            img_out.save(buffer, format='JPEG', quality=90)
+            buffer.seek(0)
+            reader = ImageReader(buffer)
+
+        with self._cache_lock:
+            self._reader_cache[cache_key] = reader
+            while len(self._reader_cache) > READER_CACHE_MAX_ENTRIES:
+                self._reader_cache.popitem(last=False)  # 最も古いエントリを破棄
+        return reader
+
+    def _compute_grid_lines(self, cols: int, rows: int,
+                            col_width_pt: float, row_height_pt: float,
+                            printable_width: float, printable_height: float,
+                            margin_left_pt: float, margin_bottom_pt: float
+                            ) -> List[Tuple[float, float, float, float]]:
+        """全グリッド線の座標 (x1, y1, x2, y2) を一括計算する（全ページ共通）"""
+        # 垂直線・水平線の座標をベクトル演算で求める（マージンを考慮）
+        xs = margin_left_pt + np.arange(cols + 1) * col_width_pt
+        ys = margin_bottom_pt + np.arange(rows + 1) * row_height_pt
+        y_top = margin_bottom_pt + printable_height
+        x_right = margin_left_pt + printable_width
+        vertical = [(x, margin_bottom_pt, x, y_top) for x in xs]
+        horizontal = [(margin_left_pt, y, x_right, y) for y in ys]
+        return vertical + horizontal
+
+    def _draw_grid_lines(self, pdf: canvas.Canvas,
+                         grid_lines: List[Tuple[float, float, float, float]]) -> None:
+        """事前計算済みのグリッド線を描画する"""
         r, g, b = (self.settings.grid_color.red() / 255.0,
                   self.settings.grid_color.green() / 255.0,
                   self.settings.grid_color.blue() / 255.0)
         pdf.setStrokeColorRGB(r, g, b)
         pdf.setLineWidth(self.settings.grid_width)
-        
-        # 垂直線（マージンを考慮）
-        for col in range(cols + 1):
-            x = margin_left_pt + col * col_width_pt
-            pdf.line(x, margin_bottom_pt, x, margin_bottom_pt + printable_height)
-        
-        # 水平線（マージンを考慮）
-        for row in range(rows + 1):
-            y = margin_bottom_pt + row * row_height_pt
-            pdf.line(margin_left_pt, y, margin_left_pt + printable_width, y)
\ No newline at end of file
+        pdf.lines(grid_lines)
\ No newline at end of file
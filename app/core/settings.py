@@ -15,9 +15,13 @@ MM_TO_PT: float = 2.83465
 SETTINGS_FILE: str = "grid_settings.json"
 PREVIEW_THUMBNAIL_SIZE: Tuple[int, int] = (200, 200)
 
-@dataclass
+@dataclass(slots=True)
 class GridSettings:
-    """グリッドとページ設定を保持するデータクラス"""
+    """グリッドとページ設定を保持するデータクラス
+
+    属性はPDF生成・プレビュー描画のホットパスで頻繁に参照されるため、
+    __slots__化してインスタンス辞書経由のルックアップを避ける。
+    """
     row_height_mm: float = 10.0
     col_width_mm: float = 10.0
     grid_line_visible: bool = True
@@ -29,10 +33,50 @@ class GridSettings:
     margin_left_mm: float = 10.0
     margin_right_mm: float = 10.0
     output_dpi: int = 300 # PDF出力時の解像度(DPI)
+    output_color: str = 'RGB' # PDF出力時のカラースペース('RGB' または 'CMYK')
+    _version: int = 0 # 変更のたびにUI側で加算される世代番号（派生値キャッシュの無効化用）
+    # --- 以下は設定確定時にrecompute_derived()で再計算される派生値 ---
+    margin_l_ratio: float = 0.0 # ページ幅に対する左マージンの比率
+    margin_r_ratio: float = 0.0
+    margin_t_ratio: float = 0.0 # ページ高さに対する上マージンの比率
+    margin_b_ratio: float = 0.0
+    cols_cached: int = 0 # 現在の設定で1ページに収まる列数・行数
+    rows_cached: int = 0
+
+    # 派生値フィールド（保存対象外）
+    _DERIVED_FIELDS = ('_version', 'margin_l_ratio', 'margin_r_ratio',
+                       'margin_t_ratio', 'margin_b_ratio', 'cols_cached', 'rows_cached')
+
+    def __post_init__(self):
+        self.recompute_derived()
+
+    def recompute_derived(self) -> None:
+        """マージン比率とグリッド行列数を再計算する
+
+        描画ループで毎回mm→pt換算や除算を繰り返さないよう、設定の確定時に
+        一度だけ計算してスロットに保持しておく。
+        """
+        page_w, page_h = self.page_size
+        self.margin_l_ratio = self.margin_left_mm * MM_TO_PT / page_w
+        self.margin_r_ratio = self.margin_right_mm * MM_TO_PT / page_w
+        self.margin_t_ratio = self.margin_top_mm * MM_TO_PT / page_h
+        self.margin_b_ratio = self.margin_bottom_mm * MM_TO_PT / page_h
+
+        p_width = page_w * (1.0 - self.margin_l_ratio - self.margin_r_ratio)
+        p_height = page_h * (1.0 - self.margin_t_ratio - self.margin_b_ratio)
+        col_w_pt = self.col_width_mm * MM_TO_PT
+        row_h_pt = self.row_height_mm * MM_TO_PT
+        if p_width <= 0 or p_height <= 0 or col_w_pt <= 0 or row_h_pt <= 0:
+            self.cols_cached = self.rows_cached = 0
+        else:
+            self.cols_cached = max(1, int(p_width / col_w_pt))
+            self.rows_cached = max(1, int(p_height / row_h_pt))
 
     def to_dict(self) -> Dict[str, Any]:
         """設定をJSONシリアライズ可能な辞書に変換"""
         settings_dict = asdict(self)
+        for key in self._DERIVED_FIELDS: # 実行時の内部状態は保存しない
+            settings_dict.pop(key)
         settings_dict['grid_color'] = self.grid_color.name() # #RRGGBB形式
         settings_dict['page_size'] = 'A4' if self.page_size == A4 else 'A3'
         return settings_dict
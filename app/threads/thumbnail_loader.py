@@ -1,53 +1,188 @@
 # app/threads/thumbnail_loader.py
-import io
+import hashlib
+import itertools
 import logging
-from typing import List
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, PriorityQueue
+from typing import List, Optional
 
 from PIL import Image, UnidentifiedImageError
-from PyQt5.QtCore import QThread, pyqtSignal, QSize, Qt
-from PyQt5.QtGui import QPixmap
+from PIL.ImageQt import ImageQt
+from PyQt5.QtCore import QStandardPaths, QThread, pyqtSignal, QSize, Qt
+from PyQt5.QtGui import QImage
 
 from app.core.settings import PREVIEW_THUMBNAIL_SIZE
 
 logger = logging.getLogger(__name__)
 
+# 高速JPEGデコーダが導入されていれば利用する（必須依存ではない）
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+try:
+    from turbojpeg import TJPF_RGB, TurboJPEG
+    _turbo_jpeg = TurboJPEG()
+except Exception:  # 未導入、またはネイティブライブラリが見つからない場合
+    _turbo_jpeg = None
+
+
+def _select_jpeg_decoder() -> str:
+    """利用可能なJPEGデコーダを選択する（IGT_JPEG_DECODER環境変数で強制可能）"""
+    available = {'simplejpeg': simplejpeg is not None,
+                 'turbojpeg': _turbo_jpeg is not None,
+                 'pil': True}
+    requested = os.environ.get('IGT_JPEG_DECODER', '').lower()
+    if requested:
+        if available.get(requested):
+            return requested
+        logger.warning(f"JPEGデコーダ '{requested}' は利用できないため自動選択します。")
+    for name in ('simplejpeg', 'turbojpeg', 'pil'):
+        if available[name]:
+            return name
+
+
+JPEG_DECODER: str = _select_jpeg_decoder()
+
 class ThumbnailLoader(QThread):
     """サムネイル生成をバックグラウンドで行うスレッド"""
-    thumbnailsReady = pyqtSignal(list)
+    # 完成したサムネイルを1枚ずつ送信。QPixmapはGUIスレッドでしか構築できないため
+    # ワーカー側はQImageを渡し、受け側でQPixmapに変換する
+    thumbnailReady = pyqtSignal(int, QImage)
     progress = pyqtSignal(int)
 
+    # 優先度: 0=ビューポート内（先にデコード）、1=それ以外のバックグラウンド
+    PRIORITY_VISIBLE = 0
+    PRIORITY_BACKGROUND = 1
+
     def __init__(self, image_paths: List[str], parent=None):
         super().__init__(parent)
         self.image_paths = image_paths
+        # 優先度付きキューから取り出した順にデコードする。全インデックスを
+        # 最初にバックグラウンド優先度で積んでおき、prioritize()は同じ
+        # インデックスをより高い優先度で積み直すだけ（重複は_doneで弾く）
+        self._queue: PriorityQueue = PriorityQueue()
+        self._seq = itertools.count()  # 同一優先度内の順序を安定させる連番
+        for i in range(len(image_paths)):
+            self._queue.put((self.PRIORITY_BACKGROUND, next(self._seq), i))
+        self._done = set()
+        self._done_lock = threading.Lock()
+        self._emitted_count = 0
+
+    def prioritize(self, indices: List[int]):
+        """指定インデックスを優先的にデコードする（GUIスレッドから呼ばれる）"""
+        for i in indices:
+            self._queue.put((self.PRIORITY_VISIBLE, next(self._seq), i))
 
     def run(self):
-        thumbnails = []
         total = len(self.image_paths)
         if total == 0:
-            self.thumbnailsReady.emit([])
             return
 
-        for i, path in enumerate(self.image_paths):
-            if self.isInterruptionRequested():
-                return
+        # デコード・縮小中はPillowがGILを解放するため、スレッドプールで並列化する
+        workers = os.cpu_count()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for future in [executor.submit(self._drain_queue) for _ in range(workers)]:
+                future.result()
+        finally:
+            executor.shutdown(wait=True)
+
+    def _drain_queue(self):
+        """キューが空になるまで優先度順にサムネイルを生成するワーカーループ"""
+        total = len(self.image_paths)
+        while not self.isInterruptionRequested():
             try:
-                with Image.open(path) as img:
-                    if img.mode == 'CMYK': img = img.convert('RGB')
-                    img.thumbnail(PREVIEW_THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
-                    
-                    buffer = io.BytesIO()
-                    img.save(buffer, format='PNG')
-                    buffer.seek(0)
-                    
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(buffer.getvalue())
-                    thumbnails.append(pixmap)
-            except (UnidentifiedImageError, FileNotFoundError, OSError) as e:
-                logger.warning(f"サムネイル生成失敗: {path}, {e}")
-                placeholder = QPixmap(QSize(*PREVIEW_THUMBNAIL_SIZE))
-                placeholder.fill(Qt.lightGray) # Qtモジュールをインポートする必要あり
-                thumbnails.append(placeholder)
-            
-            self.progress.emit(int((i + 1) / total * 100))
-        
-        self.thumbnailsReady.emit(thumbnails)
+                _, _, index = self._queue.get_nowait()
+            except Empty:
+                return  # 全インデックスが初期投入済みなので、空=取り尽くした
+            with self._done_lock:
+                if index in self._done:  # prioritize()による重複エントリ
+                    continue
+                self._done.add(index)
+            # 完成したものから順次通知する（シグナルはキュー接続でGUIスレッドに渡る）
+            self.thumbnailReady.emit(index, self._make_thumb(self.image_paths[index]))
+            with self._done_lock:
+                self._emitted_count += 1
+                self.progress.emit(int(self._emitted_count / total * 100))
+
+    def _cache_file_for(self, path: str) -> Optional[str]:
+        """ディスクキャッシュ上のサムネイルファイルパスを返す（利用不可ならNone）"""
+        cache_root = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+        if not cache_root:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        # パス・更新時刻・ファイルサイズ・目標サイズが一致する限り再利用できる
+        key = hashlib.blake2b(
+            f"{path}|{stat.st_mtime}|{stat.st_size}|{PREVIEW_THUMBNAIL_SIZE}".encode()
+        ).hexdigest()
+        return os.path.join(cache_root, "thumbnails", key[:2], f"{key}.png")
+
+    def _open_scaled(self, path: str) -> Image.Image:
+        """選択済みのデコーダで、目標サイズ付近まで縮小した状態で画像を開く"""
+        ext = os.path.splitext(path)[1].lower()
+        if ext in ('.jpg', '.jpeg') and JPEG_DECODER != 'pil':
+            with open(path, 'rb') as f:
+                data = f.read()
+            if JPEG_DECODER == 'simplejpeg':
+                arr = simplejpeg.decode_jpeg(data, fastdct=True, fastupsample=True,
+                                             min_height=PREVIEW_THUMBNAIL_SIZE[1],
+                                             min_width=PREVIEW_THUMBNAIL_SIZE[0])
+            else:  # turbojpeg
+                arr = _turbo_jpeg.decode(data, pixel_format=TJPF_RGB)
+            return Image.fromarray(arr)
+
+        img = Image.open(path)
+        # JPEGはDCTスケーリングで縮小済みの状態でデコードできる
+        if img.format == 'JPEG':
+            img.draft('RGB', PREVIEW_THUMBNAIL_SIZE)
+        return img
+
+    def _make_thumb(self, path: str) -> QImage:
+        """1枚分のサムネイルを生成する（失敗時はプレースホルダを返す）"""
+        # 同じ画像セットの再表示はディスクキャッシュから直接読み込む
+        cache_file = self._cache_file_for(path)
+        if cache_file and os.path.exists(cache_file):
+            cached = QImage(cache_file)
+            if not cached.isNull():
+                return cached
+
+        try:
+            with self._open_scaled(path) as img:
+                # ImageQtが扱えないモード（CMYK, LA, I, F など）は事前に変換する
+                # （アルファ付きはRGBAへ、それ以外はRGBへ）
+                if img.mode not in ('1', 'L', 'P', 'RGB', 'RGBA'):
+                    img = img.convert('RGBA' if 'A' in img.mode else 'RGB')
+
+                # 巨大な入力は整数倍の箱型縮小でLanczosに渡すピクセル数を先に削る
+                factor = min(img.width // PREVIEW_THUMBNAIL_SIZE[0],
+                             img.height // PREVIEW_THUMBNAIL_SIZE[1]) // 2
+                if factor > 1:
+                    img = img.reduce(factor)
+
+                # draft/reduceで目標サイズ付近まで縮小済みなので、プレビュー用途には
+                # BILINEARで十分（LANCZOSの広いカーネルを使う意味がない）
+                img.thumbnail(PREVIEW_THUMBNAIL_SIZE, Image.Resampling.BILINEAR)
+
+                # PNGエンコード/デコードを介さず、ピクセルをそのままQImageに包む
+                # （PIL側のバッファ解放に備えてcopyで実体化する）
+                qimg = ImageQt(img).copy()
+
+            if cache_file:
+                try:
+                    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                    qimg.save(cache_file, 'PNG')
+                except OSError as e:
+                    logger.warning(f"サムネイルキャッシュの保存に失敗: {cache_file}, {e}")
+            return qimg
+        except (UnidentifiedImageError, FileNotFoundError, OSError, ValueError) as e:
+            logger.warning(f"サムネイル生成失敗: {path}, {e}")
+            placeholder = QImage(QSize(*PREVIEW_THUMBNAIL_SIZE), QImage.Format_RGB32)
+            placeholder.fill(Qt.lightGray) # Qtモジュールをインポートする必要あり
+            return placeholder
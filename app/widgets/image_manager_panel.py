@@ -31,7 +31,7 @@ class ImageManagerPanel(QWidget):
 
         self.list_widget = QListWidget()
         self.list_widget.setDragDropMode(QAbstractItemView.InternalMove)
-        self.list_widget.model().rowsMoved.connect(self._on_list_changed)
+        self.list_widget.model().rowsMoved.connect(self._on_rows_moved)
         group_layout.addWidget(self.list_widget)
 
         group.setLayout(group_layout)
@@ -41,23 +41,34 @@ class ImageManagerPanel(QWidget):
         files, _ = QFileDialog.getOpenFileNames(self, "画像を選択", "", "画像ファイル (*.png *.jpg *.jpeg *.tif *.tiff *.bmp)")
         if files:
             self.list_widget.addItems(files)
-            self._on_list_changed()
-    
+            self.image_paths.extend(files)
+            self._emit_changed()
+
     def set_image_paths(self, paths: List[str]):
         self.list_widget.clear()
         self.list_widget.addItems(paths)
-        self._on_list_changed()
+        self.image_paths = list(paths)
+        self._emit_changed()
 
     def reset_images(self):
         reply = QMessageBox.question(self, "確認", "全ての画像を一括で削除しますか？",
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
             self.list_widget.clear()
-            self._on_list_changed()
-    
-    def _on_list_changed(self):
-        self.image_paths = [self.list_widget.item(i).text() for i in range(self.list_widget.count())]
+            self.image_paths = []
+            self._emit_changed()
+
+    def _on_rows_moved(self, parent, start, end, dest_parent, dest_row):
+        # QListWidgetを全件読み直さず、ドラッグで動いた範囲だけリストを並べ替える
+        moved = self.image_paths[start:end + 1]
+        del self.image_paths[start:end + 1]
+        # dest_rowは移動前のモデル上の行番号（下方向への移動では削除分だけずれる）
+        insert_at = dest_row - len(moved) if dest_row > end else dest_row
+        self.image_paths[insert_at:insert_at] = moved
+        self._emit_changed()
+
+    def _emit_changed(self):
         self.imageListChanged.emit(self.image_paths)
-    
+
     def get_image_paths(self) -> List[str]:
         return self.image_paths
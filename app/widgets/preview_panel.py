@@ -2,15 +2,32 @@
 import logging
 from typing import List
 
-from PyQt5.QtCore import QRectF, Qt, pyqtSignal
-from PyQt5.QtGui import QPainter, QPen, QPixmap
-from PyQt5.QtWidgets import (QFrame, QLabel, QProgressDialog, QScrollArea, QVBoxLayout, QWidget)
+from PyQt5.QtCore import QLineF, QPoint, QRect, QRectF, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen, QPixmap
+from PyQt5.QtWidgets import (QFrame, QLabel, QProgressBar, QScrollArea, QVBoxLayout, QWidget)
 
-from app.core.settings import GridSettings, MM_TO_PT
+from app.core.settings import GridSettings
 from app.threads.thumbnail_loader import ThumbnailLoader
 
 logger = logging.getLogger(__name__)
 
+class PreviewFrame(QFrame):
+    """プレビュー描画用のフレーム。
+
+    インスタンスへのpaintEvent代入（モンキーパッチ）はQt側のディスパッチを
+    妨げるため、通常のサブクラスとしてオーバーライドし、描画はパネルに委譲する。
+    """
+    def __init__(self, panel: 'PreviewPanel', parent=None):
+        super().__init__(parent)
+        self._panel = panel
+
+    def paintEvent(self, event):
+        self._panel._paint_preview_event(event)
+
+    def resizeEvent(self, event):
+        self._panel._geom_cache = None  # サイズ依存のジオメトリを無効化
+        super().resizeEvent(event)
+
 class PreviewPanel(QWidget):
     """画像グリッドのプレビューを表示するパネル"""
     def __init__(self, settings: GridSettings, parent=None):
@@ -18,7 +35,18 @@ class PreviewPanel(QWidget):
         self.settings = settings
         self.image_paths: List[str] = []
         self.thumbnails: List[QPixmap] = []
+        self._aspects: List[float] = []  # サムネイルのアスペクト比（描画ループでのサイズ照会を省く）
         self.thumbnail_loader: ThumbnailLoader = None
+        # 描画ジオメトリのキャッシュ（リサイズ・設定変更で無効化）
+        self._geom_cache = None
+        # グリッド寸法のキャッシュ: ((設定id, 世代番号, 画像数), 結果)
+        self._grid_cache = None
+        # 設定を連続変更中は高速スケーリングで描画し、落ち着いたら高品質で再描画する
+        self._interactive = False
+        self._interactive_timer = QTimer(self)
+        self._interactive_timer.setSingleShot(True)
+        self._interactive_timer.setInterval(150)
+        self._interactive_timer.timeout.connect(self._end_interactive)
         self._init_ui()
 
     def _init_ui(self):
@@ -27,40 +55,100 @@ class PreviewPanel(QWidget):
         self.info_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.info_label)
 
-        scroll_area = QScrollArea(); scroll_area.setWidgetResizable(True); scroll_area.setAlignment(Qt.AlignCenter)
-        self.preview_frame = QFrame()
-        self.preview_frame.paintEvent = self._paint_preview_event
-        self.preview_frame.setStyleSheet("background-color: #f0f0f0;") # 背景色を少し灰色に
-        scroll_area.setWidget(self.preview_frame)
-        layout.addWidget(scroll_area)
+        self.scroll_area = QScrollArea(); self.scroll_area.setWidgetResizable(True); self.scroll_area.setAlignment(Qt.AlignCenter)
+        self.preview_frame = PreviewFrame(self)
+        # paintEventが全面を塗り潰すため、Qt側の背景消去を省かせる
+        # （背景色はスタイルシートではなく_paint_preview_eventで塗る）
+        # 注意: WA_StaticContentsは不可。用紙は中央寄せでフレームサイズに
+        # 追従するため、リサイズ時に露出部分だけの再描画では旧位置が残る
+        self.preview_frame.setAttribute(Qt.WA_OpaquePaintEvent, True)
+        self.scroll_area.setWidget(self.preview_frame)
+        self.scroll_area.viewport().setAttribute(Qt.WA_OpaquePaintEvent, True)
+        # スクロールで見えるようになったセルのサムネイルを優先的にデコードさせる
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self._prioritize_visible)
+        layout.addWidget(self.scroll_area)
+
+        # サムネイル生成の進捗はモーダルダイアログではなくインラインで表示する
+        self.thumbnail_progress_bar = QProgressBar()
+        self.thumbnail_progress_bar.setRange(0, 100)
+        self.thumbnail_progress_bar.setVisible(False)
+        layout.addWidget(self.thumbnail_progress_bar)
     
     def on_settings_updated(self):
         """設定が変更された時に呼び出されるスロット"""
+        self._geom_cache = None
+        self._interactive = True
+        self._interactive_timer.start()  # 連続変更中はタイマーを延長し続ける
         self._update_info_label()
         self.preview_frame.update()
 
+    def _end_interactive(self):
+        self._interactive = False
+        self.preview_frame.update()  # 高品質スケーリングで描き直す
+
     def update_preview(self, image_paths: List[str]):
         self.image_paths = image_paths
         if not self.image_paths:
-            self.thumbnails.clear(); self._update_info_label(); self.preview_frame.update()
+            self.thumbnails.clear(); self._aspects.clear()
+            self._update_info_label(); self.preview_frame.update()
             return
             
         if self.thumbnail_loader and self.thumbnail_loader.isRunning():
-            self.thumbnail_loader.requestInterruption(); self.thumbnail_loader.wait()
-        
-        self.thumbnail_progress = QProgressDialog("サムネイルを準備中...", "キャンセル", 0, 100, self)
-        self.thumbnail_progress.setWindowModality(Qt.WindowModal)
-        
+            # GUIスレッドをブロックするwait()はせず、停止要求とシグナル切断のみ行う
+            self.thumbnail_loader.requestInterruption()
+            self.thumbnail_loader.thumbnailReady.disconnect()
+            self.thumbnail_loader.progress.disconnect()
+            self.thumbnail_loader.finished.disconnect()
+
+        # 完成したサムネイルから順次表示するため、スロットを先に確保しておく
+        self.thumbnails = [None] * len(self.image_paths)
+        self._aspects = [1.0] * len(self.image_paths)
+        self._update_info_label()
+
+        self.thumbnail_progress_bar.setValue(0)
+        self.thumbnail_progress_bar.setVisible(True)
+
         self.thumbnail_loader = ThumbnailLoader(self.image_paths, self)
-        self.thumbnail_loader.thumbnailsReady.connect(self._on_thumbnails_ready)
-        self.thumbnail_loader.progress.connect(self.thumbnail_progress.setValue)
-        self.thumbnail_progress.canceled.connect(self.thumbnail_loader.requestInterruption)
+        self.thumbnail_loader.thumbnailReady.connect(self._on_thumbnail_ready)
+        self.thumbnail_loader.progress.connect(self.thumbnail_progress_bar.setValue)
+        self.thumbnail_loader.finished.connect(self._on_thumbnails_finished)
         self.thumbnail_loader.start()
-        self.thumbnail_progress.exec_()
+        self._prioritize_visible()  # まず現在見えているセルを先頭に回す
+
+    def _prioritize_visible(self):
+        """ビューポートと交差するセルのサムネイルをロードキューの先頭に回す"""
+        if not (self.thumbnail_loader and self.thumbnail_loader.isRunning()):
+            return
+        rows, cols, _ = self.calculate_grid_dimensions()
+        if rows == 0 or cols == 0:
+            return
+        _, origin_x, origin_y, cell_w, cell_h, _, _, rows, cols = self._ensure_geometry()
+
+        viewport = self.scroll_area.viewport()
+        top_left = self.preview_frame.mapFromGlobal(viewport.mapToGlobal(QPoint(0, 0)))
+        visible_rect = QRect(top_left, viewport.size())
+
+        indices = []
+        for i in range(min(len(self.thumbnails), rows * cols)):
+            if self.thumbnails[i] is not None:  # デコード済み
+                continue
+            r, c = i // cols, i % cols
+            tile_rect = QRect(int(origin_x + c * cell_w), int(origin_y + r * cell_h),
+                              int(cell_w) + 1, int(cell_h) + 1)
+            if visible_rect.intersects(tile_rect):
+                indices.append(i)
+        if indices:
+            self.thumbnail_loader.prioritize(indices)
+
+    def _on_thumbnails_finished(self):
+        self.thumbnail_progress_bar.setVisible(False)
 
-    def _on_thumbnails_ready(self, thumbnails: List[QPixmap]):
-        self.thumbnail_progress.setValue(100)
-        self.thumbnails = thumbnails; self._update_info_label(); self.preview_frame.update()
+    def _on_thumbnail_ready(self, index: int, image: QImage):
+        if index < len(self.thumbnails):
+            # QPixmapの構築はGUIスレッドでのみ安全
+            self.thumbnails[index] = QPixmap.fromImage(image)
+            self._aspects[index] = image.width() / max(1, image.height())
+            self.preview_frame.update()
 
     def _update_info_label(self):
         if not self.image_paths:
@@ -73,29 +161,37 @@ class PreviewPanel(QWidget):
         self.info_label.setText(info)
         
     def calculate_grid_dimensions(self):
-        s = self.settings; page_w, page_h = s.page_size
-        p_width = page_w - (s.margin_left_mm + s.margin_right_mm) * MM_TO_PT
-        p_height = page_h - (s.margin_top_mm + s.margin_bottom_mm) * MM_TO_PT
-        if p_width <=0 or p_height <= 0: return 0, 0, 0
-        
-        col_w_pt = s.col_width_mm * MM_TO_PT
-        row_h_pt = s.row_height_mm * MM_TO_PT
-        if col_w_pt <= 0 or row_h_pt <= 0: return 0, 0, 0
+        # 情報ラベルと描画の双方から毎回呼ばれるため、設定の世代番号と
+        # 画像数が変わらない限り前回の結果を返す
+        cache_key = (id(self.settings), self.settings._version, len(self.image_paths))
+        if self._grid_cache is not None and self._grid_cache[0] == cache_key:
+            return self._grid_cache[1]
+        result = self._compute_grid_dimensions()
+        self._grid_cache = (cache_key, result)
+        return result
 
-        cols = max(1, int(p_width / col_w_pt)); rows = max(1, int(p_height / row_h_pt))
+    def _compute_grid_dimensions(self):
+        # 行数・列数は設定確定時にGridSettings側で計算済み。ここではページ数のみ導出する
+        s = self.settings
+        rows, cols = s.rows_cached, s.cols_cached
         cells_per_page = cols * rows
-        if cells_per_page == 0: return cols, rows, 0
-        
+        if cells_per_page == 0: return rows, cols, 0
+
         num_pages = (len(self.image_paths) + cells_per_page - 1) // cells_per_page
         return rows, cols, max(1, num_pages)
 
-    def _paint_preview_event(self, event):
-        painter = QPainter(self.preview_frame)
-        painter.setRenderHint(QPainter.Antialiasing); painter.setRenderHint(QPainter.SmoothPixmapTransform)
-        
+    def _ensure_geometry(self):
+        """フレームサイズと設定から描画ジオメトリを計算する。
+
+        ドラッグ中は毎フレーム描画されるため、リサイズか設定変更まで結果を
+        キャッシュして再計算を避ける。
+        """
+        if self._geom_cache is not None:
+            return self._geom_cache
+
         frame_w, frame_h = self.preview_frame.width(), self.preview_frame.height()
         page_w_pt, page_h_pt = self.settings.page_size
-        
+
         aspect_ratio_frame = frame_w / frame_h
         aspect_ratio_page = page_w_pt / page_h_pt
 
@@ -105,46 +201,82 @@ class PreviewPanel(QWidget):
             draw_w = frame_w - 20; draw_h = draw_w / aspect_ratio_page
 
         offset_x, offset_y = (frame_w - draw_w) / 2, (frame_h - draw_h) / 2
-        
-        painter.setBrush(Qt.white); painter.setPen(Qt.black)
         paper_rect = QRectF(offset_x, offset_y, draw_w, draw_h)
-        painter.drawRect(paper_rect)
-
-        if not self.image_paths or not self.thumbnails:
-            painter.end()
-            return
 
         s = self.settings
         rows, cols, _ = self.calculate_grid_dimensions()
 
-        margin_l_px = draw_w * (s.margin_left_mm * MM_TO_PT) / page_w_pt
-        margin_r_px = draw_w * (s.margin_right_mm * MM_TO_PT) / page_w_pt
-        margin_t_px = draw_h * (s.margin_top_mm * MM_TO_PT) / page_h_pt
-        margin_b_px = draw_h * (s.margin_bottom_mm * MM_TO_PT) / page_h_pt
-        
+        # 比率は設定確定時に計算済みなので、フレームサイズとの乗算だけで済む
+        margin_l_px = draw_w * s.margin_l_ratio
+        margin_r_px = draw_w * s.margin_r_ratio
+        margin_t_px = draw_h * s.margin_t_ratio
+        margin_b_px = draw_h * s.margin_b_ratio
+
         p_w = draw_w - (margin_l_px + margin_r_px); p_h = draw_h - (margin_t_px + margin_b_px)
-        
+
         # 描画は左上原点なので、Y軸の計算に注意
         origin_x, origin_y = offset_x + margin_l_px, offset_y + margin_t_px
-        
-        cell_w, cell_h = p_w / cols, p_h / rows
+
+        # マージンがページを超える設定ファイルでは行列数が0になり得る
+        cell_w = p_w / cols if cols else 0.0
+        cell_h = p_h / rows if rows else 0.0
+
+        self._geom_cache = (paper_rect, origin_x, origin_y, cell_w, cell_h, p_w, p_h, rows, cols)
+        return self._geom_cache
+
+    def _paint_preview_event(self, event):
+        painter = QPainter(self.preview_frame)
+        # WA_OpaquePaintEventにより背景は消去されないので、要求領域を自前で塗る
+        painter.fillRect(event.rect(), QColor("#f0f0f0")) # 背景色を少し灰色に
+        painter.setRenderHint(QPainter.Antialiasing)
+        # ドラッグ中は品質差が知覚できないため、高速な最近傍変換で描画する
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, not self._interactive)
+
+        paper_rect, origin_x, origin_y, cell_w, cell_h, p_w, p_h, rows, cols = self._ensure_geometry()
+
+        painter.setBrush(Qt.white); painter.setPen(Qt.black)
+        painter.drawRect(paper_rect)
+
+        # グリッドが成立しない設定（マージン過大など）では用紙のみ描画する
+        if rows == 0 or cols == 0 or not self.image_paths or not self.thumbnails:
+            painter.end()
+            return
+
+        s = self.settings
+        # 再描画要求された領域のみを塗り直す（Qtが複数のupdate()を領域単位で合流させる）
+        region = event.region()
+        cell_aspect = cell_w / cell_h if cell_h > 0 else 1.0
         for i in range(min(len(self.thumbnails), rows * cols)):
             r, c = i // cols, i % cols
             thumb = self.thumbnails[i]
-            
+            if thumb is None:  # まだ生成されていないサムネイル
+                continue
+
             cell_x, cell_y = origin_x + c * cell_w, origin_y + r * cell_h
-            target_rect = QRectF(cell_x, cell_y, cell_w, cell_h)
-            
-            pixmap_scaled = thumb.scaled(target_rect.size().toSize(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            px, py = cell_x + (cell_w - pixmap_scaled.width()) / 2, cell_y + (cell_h - pixmap_scaled.height()) / 2
-            painter.drawPixmap(int(px), int(py), pixmap_scaled)
+            tile_rect = QRect(int(cell_x), int(cell_y), int(cell_w) + 1, int(cell_h) + 1)
+            if not region.intersects(tile_rect):
+                continue
+
+            # 事前計算済みのアスペクト比から配置サイズを算出する
+            # （スケーリング結果のQPixmapにwidth()/height()を問い合わせない）
+            aspect = self._aspects[i]
+            if aspect > cell_aspect:
+                pw, ph = cell_w, cell_w / aspect
+            else:
+                pw, ph = cell_h * aspect, cell_h
+            px, py = cell_x + (cell_w - pw) / 2, cell_y + (cell_h - ph) / 2
+
+            # 中間のスケーリング済みQPixmapを生成せず、描画時にQt側で拡縮と
+            # 転送をまとめて行う（ラスタバックエンドの最適化パスに乗る）
+            painter.drawPixmap(QRectF(px, py, pw, ph), thumb, QRectF(thumb.rect()))
             
         if s.grid_line_visible:
             pen = QPen(s.grid_color); pen.setWidth(s.grid_width); painter.setPen(pen)
-            for c in range(cols + 1):
-                x = origin_x + c * cell_w
-                painter.drawLine(int(x), int(origin_y), int(x), int(origin_y + p_h))
-            for r in range(rows + 1):
-                y = origin_y + r * cell_h
-                painter.drawLine(int(origin_x), int(y), int(origin_x + p_w), int(y))
+            # 1本ずつdrawLineを呼ばず、全グリッド線を1回のdrawLinesでまとめて描画する
+            # （QLineFの浮動小数点座標はint()切り捨てによる線のガタつきも防ぐ）
+            lines = [QLineF(origin_x + c * cell_w, origin_y,
+                            origin_x + c * cell_w, origin_y + p_h) for c in range(cols + 1)]
+            lines += [QLineF(origin_x, origin_y + r * cell_h,
+                             origin_x + p_w, origin_y + r * cell_h) for r in range(rows + 1)]
+            painter.drawLines(lines)
         painter.end()
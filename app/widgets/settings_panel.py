@@ -4,7 +4,7 @@ from typing import Tuple
 from PyQt5.QtWidgets import (QCheckBox, QColorDialog, QComboBox,
                              QDoubleSpinBox, QGridLayout, QGroupBox, QLabel,
                              QPushButton, QSpinBox, QVBoxLayout, QWidget)
-from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtCore import QTimer, pyqtSignal
 from reportlab.lib.pagesizes import A3, A4
 
 from app.core.settings import GridSettings
@@ -17,6 +17,11 @@ class SettingsPanel(QWidget):
     def __init__(self, settings: GridSettings, parent=None):
         super().__init__(parent)
         self.settings = settings
+        # スピンボックス連打などの短時間に連続した変更を1回の通知にまとめる
+        self._emit_timer = QTimer(self)
+        self._emit_timer.setSingleShot(True)
+        self._emit_timer.setInterval(50)
+        self._emit_timer.timeout.connect(self.settingsChanged.emit)
         self._init_ui()
         self.update_ui_from_settings()
 
@@ -64,8 +69,12 @@ class SettingsPanel(QWidget):
         output_group = QGroupBox("出力設定")
         output_layout = QGridLayout()
         self.dpi_spin = self._create_int_spinbox("解像度 (DPI):", (72, 1200), self.on_settings_changed)
+        self.output_color_combo = QComboBox()
+        self.output_color_combo.addItems(["RGB", "CMYK"])
+        self.output_color_combo.currentTextChanged.connect(self.on_settings_changed)
         output_layout.addWidget(self.dpi_spin[0], 0, 0)
         output_layout.addWidget(self.dpi_spin[1], 0, 1)
+        output_layout.addWidget(QLabel("出力カラー:"), 1, 0); output_layout.addWidget(self.output_color_combo, 1, 1)
         output_group.setLayout(output_layout)
         layout.addWidget(output_group)
         
@@ -93,7 +102,10 @@ class SettingsPanel(QWidget):
         s.margin_top_mm = self.margin_top[1].value(); s.margin_bottom_mm = self.margin_bottom[1].value()
         s.margin_left_mm = self.margin_left[1].value(); s.margin_right_mm = self.margin_right[1].value()
         s.output_dpi = self.dpi_spin[1].value()
-    
+        s.output_color = self.output_color_combo.currentText()
+        s.recompute_derived()  # マージン比率・行列数を確定時に一度だけ計算する
+        s._version += 1  # 設定から導出した値のキャッシュを無効化する
+
     def update_ui_from_settings(self):
         s = self.settings
         widgets_to_block = self.findChildren((QSpinBox, QDoubleSpinBox, QCheckBox, QComboBox))
@@ -105,10 +117,11 @@ class SettingsPanel(QWidget):
         self.margin_top[1].setValue(s.margin_top_mm); self.margin_bottom[1].setValue(s.margin_bottom_mm)
         self.margin_left[1].setValue(s.margin_left_mm); self.margin_right[1].setValue(s.margin_right_mm)
         self.dpi_spin[1].setValue(s.output_dpi)
-        
+        self.output_color_combo.setCurrentText(s.output_color)
+
         for widget in widgets_to_block: widget.blockSignals(False)
         self.settingsChanged.emit() # 反映後にシグナルを送る
 
     def on_settings_changed(self):
         self.update_settings_from_ui()
-        self.settingsChanged.emit()
+        self._emit_timer.start()  # 連続変更中は発火を先送りして1回にまとめる
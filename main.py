@@ -1,13 +1,19 @@
 # main.py
+import logging
 import sys
 
+import PIL
 from PyQt5.QtWidgets import QApplication
 
 from app.main_window import ImageGridApp
 
+logger = logging.getLogger(__name__)
+
 
 def main():
     """アプリケーションのメインエントリーポイント"""
+    # Pillow-SIMD導入確認用（".postN"サフィックスがあればSIMDビルド）
+    logger.info(f"Pillowバージョン: {PIL.__version__}")
     app = QApplication(sys.argv)
     window = ImageGridApp()
     window.show()